@@ -0,0 +1,93 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Set
+
+from fastapi import HTTPException
+from loguru import logger
+
+from config import (
+    MAX_CONCURRENT_REQUESTS,
+    MAX_QUEUE_WAIT,
+    MAX_QUEUED_REQUESTS,
+    RETRY_AFTER_SECONDS,
+)
+
+
+class AdmissionController:
+    """
+    /message 请求的准入控制：
+    - 同一会话同时只处理一条消息，避免同一个 checkpoint 被并发修改；
+      会话已有消息在处理时立即返回 429，不排队等待（一轮 agent 可能持续数分钟）
+    - 全局并发上限，超出的请求进入有界等待队列，队列已满或等待超时时返回 503
+    - 拒绝响应均带 Retry-After
+    """
+    def __init__(self,
+                 max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+                 max_queue: int = MAX_QUEUED_REQUESTS,
+                 max_wait: float = MAX_QUEUE_WAIT,
+                 retry_after: int = RETRY_AFTER_SECONDS) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active_sessions: Set[str] = set()
+        self._in_flight = 0
+        self._queued = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+
+    def _reject(self, status_code: int, detail: str) -> HTTPException:
+        self._rejected += 1
+        logger.warning(f"请求被拒绝（{status_code}）：{detail}")
+        return HTTPException(status_code=status_code, detail=detail,
+                             headers={"Retry-After": str(self.retry_after)})
+
+    @asynccontextmanager
+    async def admit(self, session_id: str) -> AsyncIterator[None]:
+        if session_id in self._active_sessions:
+            raise self._reject(429, "该会话已有消息正在处理，请稍后再试")
+        # 按“处理中 + 排队中”计数判断容量，不依赖 Semaphore.locked() 的瞬时状态
+        if self._in_flight + self._queued >= self.max_concurrency + self.max_queue:
+            raise self._reject(503, "服务繁忙，请稍后再试")
+
+        # 排队期间也占住会话，同一会话的后续请求直接被拒绝
+        self._active_sessions.add(session_id)
+        start_time = time.perf_counter()
+        self._queued += 1
+        try:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                raise self._reject(503, "服务繁忙，排队超时，请稍后再试")
+            finally:
+                self._queued -= 1
+
+            wait_time = time.perf_counter() - start_time
+            self._admitted += 1
+            self._total_wait += wait_time
+            self._max_wait_seen = max(self._max_wait_seen, wait_time)
+            self._in_flight += 1
+            try:
+                yield
+            finally:
+                self._in_flight -= 1
+                self._semaphore.release()
+        finally:
+            self._active_sessions.discard(session_id)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "active_sessions": len(self._active_sessions),
+            "queue_depth": self._queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "avg_wait_time": self._total_wait / self._admitted if self._admitted else 0.0,
+            "max_wait_time": self._max_wait_seen,
+        }
@@ -1,9 +1,8 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
 from dotenv import load_dotenv
-from pydantic import SecretStr
 import os
 from tools import get_tools
+from agents.llm_client import create_chat_model
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_community.utilities import SQLDatabase
@@ -62,15 +61,18 @@ extract_title_prompt = """
 
 对话标题：
 """
-logger.info(f"System message initialized: {system_message}")
+# 客户端断开、处理被取消时写入对话记录的占位回复
+CANCELLED_MESSAGE = "（请求已取消）"
+
+logger.info(f"System message initialized ({len(system_message)} chars)")
 prompt = SystemMessage(content=system_message)
 
 class LifestyleAgent:
     def __init__(self) -> None:
         self.tools = get_tools()
-        self.model = ChatOpenAI(
+        self.model = create_chat_model(
             base_url = silicon_flow_api_base,
-            api_key = SecretStr(silicon_flow_api_key),
+            api_key = silicon_flow_api_key,
             model = "Qwen/Qwen3-30B-A3B-Thinking-2507",  # 模型名称
         )
         self.memory_saver = MemorySaver()
@@ -89,10 +91,33 @@ class LifestyleAgent:
         tool_usage = self.get_tool_usage(response)
         return response, token_usage, tool_usage
     
-    async def process_conversation_title(self, message: str, config: dict = None):
+    async def close_cancelled_run(self, config: dict = None):
+        """
+        处理被取消后补全 checkpoint 中未完成的一轮对话：
+        为未返回结果的工具调用补上 ToolMessage，并以取消占位回复结束本轮，
+        保证同一会话的下一条消息能正常继续。
+        """
+        state = await self.agent_executor.aget_state(config)
+        messages = state.values.get("messages", [])
+        if not messages:
+            return
+        last_message = messages[-1]
+        patch = []
+        if isinstance(last_message, AIMessage) and last_message.tool_calls:
+            patch += [
+                ToolMessage(content=CANCELLED_MESSAGE, tool_call_id=tool_call["id"], name=tool_call["name"])
+                for tool_call in last_message.tool_calls
+            ]
+        if patch or not isinstance(last_message, AIMessage):
+            patch.append(AIMessage(content=CANCELLED_MESSAGE))
+        if patch:
+            await self.agent_executor.aupdate_state(config, {"messages": patch}, as_node="agent")
+
+    async def process_conversation_title(self, message: str) -> str:
+        # 直接调用模型，不经过 agent 和 checkpointer，各会话的标题提取互不影响
         message = SystemMessage(content=extract_title_prompt.format(message=message))
-        response = await self.agent_executor.ainvoke({"messages": [message]}, config=config)
-        return response
+        response = await self.model.ainvoke([message])
+        return response.content
 
     def cal_tokens(self, response) -> int:
         result = 0
@@ -0,0 +1,144 @@
+import asyncio
+from typing import Any, AsyncIterator, List, Optional
+
+import httpx
+import openai
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+from loguru import logger
+from pydantic import PrivateAttr, SecretStr
+
+from config import (
+    LLM_CALL_DEADLINE,
+    LLM_CONNECT_TIMEOUT,
+    LLM_FALLBACK_MODEL,
+    LLM_FALLBACK_RESERVE,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE,
+    LLM_MAX_RETRIES,
+    LLM_TIMEOUT,
+)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """创建带连接池和长连接的异步 HTTP 客户端，供主模型和备用模型共用。"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def _should_fallback(error: Exception) -> bool:
+    """只有限流、服务端错误、超时和连接错误才改用备用模型。"""
+    if isinstance(error, (asyncio.TimeoutError, openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class PooledChatOpenAI(ChatOpenAI):
+    """
+    限制并发和调用时限的 ChatOpenAI。
+
+    重试由 openai SDK 完成（max_retries）：遇到 429、5xx 和超时时按带随机抖动的指数退避重试，
+    并遵循服务端返回的 Retry-After。配置了 fallback 时，主模型只使用 call_deadline 减去
+    fallback_reserve 的时间；超时或重试耗尽仍是限流、5xx、连接错误时，用剩余时间调用备用模型。
+    其他错误（如 400、401）直接抛出，不回退。
+
+    流式调用（_astream）只受并发上限约束，不受 call_deadline 限制，也不回退。
+    """
+    call_deadline: Optional[float] = None
+    fallback: Optional[ChatOpenAI] = None
+    fallback_reserve: float = 0.0
+    _semaphore: asyncio.Semaphore = PrivateAttr()
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        async with self._semaphore:
+            if self.fallback is None:
+                return await asyncio.wait_for(
+                    super()._agenerate(messages, stop, run_manager, **kwargs),
+                    timeout=self.call_deadline,
+                )
+            return await self._agenerate_with_fallback(messages, stop, run_manager, **kwargs)
+
+    async def _agenerate_with_fallback(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.call_deadline if self.call_deadline else None
+        primary_timeout = self.call_deadline - self.fallback_reserve if self.call_deadline else None
+        try:
+            return await asyncio.wait_for(
+                super()._agenerate(messages, stop, run_manager, **kwargs),
+                timeout=primary_timeout,
+            )
+        except Exception as e:
+            if not _should_fallback(e):
+                raise
+            logger.warning(f"模型 {self.model_name} 调用失败（{type(e).__name__}），改用备用模型 {self.fallback.model_name}")
+        return await asyncio.wait_for(
+            self.fallback._agenerate(messages, stop, run_manager, **kwargs),
+            timeout=deadline - loop.time() if deadline else None,
+        )
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async with self._semaphore:
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                yield chunk
+
+
+def create_chat_model(model: str, base_url: str, api_key: str) -> PooledChatOpenAI:
+    """按 config 中的配置创建主模型，以及可选的备用模型。"""
+    http_async_client = create_http_client()
+    client_kwargs = dict(
+        base_url=base_url,
+        api_key=SecretStr(api_key),
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        max_retries=LLM_MAX_RETRIES,
+        http_async_client=http_async_client,
+    )
+    fallback = ChatOpenAI(model=LLM_FALLBACK_MODEL, **client_kwargs) if LLM_FALLBACK_MODEL else None
+    primary_budget = LLM_CALL_DEADLINE - (LLM_FALLBACK_RESERVE if fallback else 0)
+    if (LLM_MAX_RETRIES + 1) * LLM_TIMEOUT > primary_budget:
+        logger.warning(
+            f"主模型最坏耗时 (LLM_MAX_RETRIES + 1) * LLM_TIMEOUT = {(LLM_MAX_RETRIES + 1) * LLM_TIMEOUT}s "
+            f"超过可用时限 {primary_budget}s，重试可能在完成前被截断"
+        )
+    logger.info(
+        f"模型客户端：{model}，备用模型：{LLM_FALLBACK_MODEL}，最大并发：{LLM_MAX_CONCURRENCY}，"
+        f"超时：{LLM_TIMEOUT}s，总时限：{LLM_CALL_DEADLINE}s，重试：{LLM_MAX_RETRIES}"
+    )
+    return PooledChatOpenAI(
+        model=model,
+        call_deadline=LLM_CALL_DEADLINE,
+        fallback=fallback,
+        fallback_reserve=LLM_FALLBACK_RESERVE,
+        **client_kwargs,
+    )
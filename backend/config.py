@@ -0,0 +1,31 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 后端可调参数，对应的环境变量说明见 README.md
+
+# 模型调用
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))                     # 单次 HTTP 请求超时（秒）
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))      # 建立连接超时（秒）
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))                # 429/5xx/超时的重试次数
+LLM_CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", "120"))        # 单次模型调用总时限，包含重试和回退（秒）
+LLM_FALLBACK_RESERVE = float(os.getenv("LLM_FALLBACK_RESERVE", "30"))   # 总时限中留给备用模型的时间（秒）
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))       # 连接池最大连接数
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))           # 连接池保持的空闲长连接数
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))   # 空闲长连接的保留时间（秒）
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))        # 同时进行中的模型调用上限
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL")                    # 主模型失败时使用的备用模型，不设置则不回退
+
+# /message 准入控制
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "8"))     # 同时处理的 /message 请求上限
+MAX_QUEUED_REQUESTS = int(os.getenv("MAX_QUEUED_REQUESTS", "16"))            # 等待队列长度上限
+MAX_QUEUE_WAIT = float(os.getenv("MAX_QUEUE_WAIT", "30"))                    # 在队列中最长等待时间（秒）
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "5"))            # 拒绝时建议客户端重试的间隔（秒）
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))  # 客户端断开检测的轮询间隔（秒）
+
+# 日志
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_JSON = os.getenv("LOG_JSON", "true").lower() == "true"                  # 是否输出 JSON 结构化日志
+LOG_MAX_FIELD_LENGTH = int(os.getenv("LOG_MAX_FIELD_LENGTH", "500"))        # 消息和附加字段的最大长度，超出部分截断
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))                # 单次请求日志的采样率，WARNING 及以上不受采样影响
@@ -21,7 +21,7 @@ def execute_query(query: str, params: tuple = (), fetch_one: bool = False):
                 conn.commit()
                 return cursor.lastrowid
     except Exception as e:
-        logger.info(f"数据库语句失败：{e}")
+        logger.error(f"数据库语句失败：{e}")
         raise
     
 def execute_many(query: str, params: list):
@@ -31,5 +31,5 @@ def execute_many(query: str, params: list):
             cursor.executemany(query, params)
             conn.commit()
     except Exception as e:
-        logger.info(f"批量执行数据库语句失败：{e}")
+        logger.error(f"批量执行数据库语句失败：{e}")
         raise
\ No newline at end of file
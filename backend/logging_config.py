@@ -0,0 +1,54 @@
+import random
+import sys
+
+from loguru import logger
+
+from config import LOG_JSON, LOG_LEVEL, LOG_MAX_FIELD_LENGTH, LOG_SAMPLE_RATE
+
+_WARNING_LEVEL_NO = logger.level("WARNING").no
+
+LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {extra[request_id]} | {name}:{line} - {message}"
+
+
+def truncate(value: str, max_length: int = LOG_MAX_FIELD_LENGTH) -> str:
+    """截断过长的日志内容，并注明原始长度。"""
+    if len(value) <= max_length:
+        return value
+    return f"{value[:max_length]}...（共 {len(value)} 字符）"
+
+
+def _truncate_record(record) -> None:
+    record["message"] = truncate(record["message"])
+    for key, value in record["extra"].items():
+        if isinstance(value, str):
+            record["extra"][key] = truncate(value)
+
+
+def _sampling_filter(record) -> bool:
+    # 未被采样的请求只保留 WARNING 及以上的日志
+    return record["extra"].get("sampled", True) or record["level"].no >= _WARNING_LEVEL_NO
+
+
+def should_sample() -> bool:
+    """决定当前请求的日志是否输出。"""
+    return random.random() < LOG_SAMPLE_RATE
+
+
+def setup_logging() -> None:
+    """
+    替换 loguru 默认的同步输出：日志经队列由后台线程写出，
+    不阻塞事件循环；字段统一截断，并带上当前请求的 request_id。
+    """
+    logger.remove()
+    logger.configure(
+        extra={"request_id": "-", "sampled": True},
+        patcher=_truncate_record,
+    )
+    logger.add(
+        sys.stderr,
+        level=LOG_LEVEL,
+        format=LOG_FORMAT,
+        serialize=LOG_JSON,
+        enqueue=True,
+        filter=_sampling_filter,
+    )
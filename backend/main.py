@@ -1,19 +1,29 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from pydantic import BaseModel
 from loguru import logger
+from logging_config import setup_logging, should_sample
+setup_logging()
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Literal
 from datetime import datetime
-from agents.lifestyle_agent import LifestyleAgent
-import time, os
+from agents.lifestyle_agent import LifestyleAgent, CANCELLED_MESSAGE
+import asyncio, time, os, uuid
 from database import *
 from router import reminder, conversation, messages
+from admission import AdmissionController
+from config import DISCONNECT_POLL_INTERVAL
 
 origins = [
     "http://localhost:5173",
 ]
 messageDB = MessageDB()
 conversationDB = ConversationDB()
+admission = AdmissionController()
+# 消息处理结果统计
+run_stats = {
+    "completed": 0,
+    "cancelled": 0
+}
 
 app = FastAPI()
 # 配置跨域资源共享
@@ -45,23 +55,60 @@ class ResponseMessage(BaseModel):
     
 life_agent = LifestyleAgent()
 
+async def cancel_on_disconnect(request: Request, task: asyncio.Task) -> bool:
+    """轮询客户端连接状态，断开时取消正在处理的任务。"""
+    while not task.done():
+        if await request.is_disconnected():
+            task.cancel()
+            return True
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+    return False
+
 @app.post("/message")
-async def receive_message(message: UserMessage):
+async def receive_message(message: UserMessage, request: Request):
     thread_id = message.session_id or f"session_{int(time.time())}"
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    # request_id 随上下文传递到 agent、工具和数据库日志中
+    with logger.contextualize(request_id=request_id, sampled=should_sample()):
+        # 排队阶段就开始检测断开，客户端离开后不再等待准入
+        task = asyncio.create_task(admit_message(message, thread_id))
+        watcher = asyncio.create_task(cancel_on_disconnect(request, task))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if not (watcher.done() and not watcher.cancelled() and watcher.result()):
+                raise
+            # 客户端已断开，响应不会被读取
+            logger.warning(f"客户端已断开，取消会话 {thread_id} 的处理")
+            run_stats["cancelled"] += 1
+            return {
+                "message": CANCELLED_MESSAGE,
+                "success": False,
+                "tool_used": [],
+                "metadata": {}
+            }
+        finally:
+            watcher.cancel()
+            if not task.done():
+                # 处理函数自身被取消时同样取消任务，并等它完成清理、释放会话锁后再返回
+                task.cancel()
+                await asyncio.shield(asyncio.wait({task}))
+
+async def admit_message(message: UserMessage, thread_id: str):
+    # 同一会话串行处理，并受全局并发和排队上限约束
+    async with admission.admit(thread_id):
+        return await handle_message(message, thread_id)
+
+async def handle_message(message: UserMessage, thread_id: str):
     config = {
         "configurable":{
             "thread_id": thread_id
         }
     }
     if(conversationDB.has_conversation(thread_id) is False):
-        config_extract_first = {
-            "configurable": {
-                "thread_id": "extract_title_from_first_message"
-            }
-        }
-        title = await life_agent.process_conversation_title(message.message, config=config_extract_first)
-        logger.info(f"标题：{title['messages'][-1].content}")
-        conversationDB.create_conversation(thread_id, title['messages'][-1].content)
+        title = await life_agent.process_conversation_title(message.message)
+        logger.info(f"标题：{title}")
+        conversationDB.create_conversation(thread_id, title)
 
     # 添加用户消息记录
     messageDB.add_message(thread_id, 'user', message.message, datetime.now().isoformat(), None)
@@ -70,8 +117,16 @@ async def receive_message(message: UserMessage):
 
     logger.info(f"session id: {thread_id}")
 
-    response, token_usage, tool_usage = await life_agent.process_message(message.message, config=config)
-    logger.info(f"Received message: {message.message} at {message.timestamp}")
+    try:
+        response, token_usage, tool_usage = await life_agent.process_message(message.message, config=config)
+    except asyncio.CancelledError:
+        # 取消后补全 checkpoint 并记录占位回复，使对话记录与 checkpoint 保持一致
+        await life_agent.close_cancelled_run(config)
+        messageDB.add_message(thread_id, 'assistant', CANCELLED_MESSAGE, datetime.now().isoformat(), None)
+        conversationDB.update_conversation_count(thread_id)
+        raise
+    run_stats["completed"] += 1
+    logger.info(f"Received message ({len(message.message)} chars) at {message.timestamp}")
 
     end_time = time.perf_counter()
     response_time = end_time - start_time
@@ -99,11 +154,13 @@ async def receive_message(message: UserMessage):
                 "response_time": response_time,
             }
         }
-    logger.info(f"Response: {response['message']} at {datetime.now()}, used tokens {token_usage}, response time: {response_time:.2f} seconds")
+    logger.info(f"Response ({len(response['message'])} chars) at {datetime.now()}, used tokens {token_usage}, response time: {response_time:.2f} seconds")
     return response
 
 @app.get("/health")
 async def health_check():
     return {
-        "status": "ok"
+        "status": "ok",
+        "admission": admission.stats(),
+        "runs": run_stats
     }
\ No newline at end of file
@@ -1,54 +1,253 @@
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-from typing import Type, Optional, Any, Annotated
+from typing import Type, Optional, Any, List
+from decimal import (Decimal, Context, DivisionByZero, InvalidOperation, Overflow, Underflow, Subnormal,
+                     ROUND_HALF_UP, getcontext, localcontext)
+from functools import lru_cache
+import ast
+import operator
 import re
+import time
+
+# 计算限制：防止 9**9**9 这类表达式拖垮进程
+MAX_EXPRESSION_LENGTH = 200     # 单个表达式最大长度
+MAX_NODES = 100                 # 单个表达式最多的语法节点数
+MAX_EXPONENT = 1000             # 幂运算指数的绝对值上限
+MAX_BATCH_SIZE = 20             # 批量计算最多的表达式数量
+TIME_BUDGET = 0.05              # 单个表达式的计算时间预算（秒），上面的限制已保证单步很快，这里只是兜底
+DISPLAY_PRECISION = 15          # 结果展示的有效数字位数，避免 1/3*3 显示为 0.999…
+DISPLAY_FIXED_RANGE = (-10, DISPLAY_PRECISION - 1)  # 数量级在此范围内时按普通小数展示，否则用科学计数法
+
+# Decimal 上下文：28 位有效数字，数量级超出 1e±100 时抛出 Overflow / Underflow，而不是静默变成无穷大或 0
+DECIMAL_CONTEXT = Context(prec=28, Emax=100, Emin=-100,
+                          traps=[DivisionByZero, InvalidOperation, Overflow, Underflow, Subnormal])
+
+# 结果展示用的上下文，四舍五入到 DISPLAY_PRECISION 位有效数字
+DISPLAY_CONTEXT = Context(prec=DISPLAY_PRECISION, rounding=ROUND_HALF_UP, Emax=100, Emin=-100,
+                          traps=[InvalidOperation, Overflow, Underflow, Subnormal])
+
+# 百分号写法：% 后面不是数字或左括号时视为百分数，与空格无关，如 "100 * 20%"、"3000*20%+500"、"(10 + 5)%"；
+# "10 % 3" 为取模，对负数取模需写成 "10 % (-3)"
+_POSTFIX_PERCENT_PATTERN = re.compile(r'%(?!\s*[\d.(])')
+_NUMBER_SUFFIX_PATTERN = re.compile(r'(\d+\.?\d*|\.\d+)$')
+
+
+def _floordiv(left: Decimal, right: Decimal) -> Decimal:
+    # Decimal 的 // 向零取整，这里按 Python 的规则向下取整：-7 // 2 == -4
+    quotient, remainder = divmod(left, right)
+    if remainder and (remainder < 0) != (right < 0):
+        quotient -= 1
+    return quotient
+
+
+def _mod(left: Decimal, right: Decimal) -> Decimal:
+    # 余数与除数同号，与 Python 的 % 一致：-7 % 2 == 1
+    remainder = left % right
+    if remainder and (remainder < 0) != (right < 0):
+        remainder += right
+    return remainder
+
+
+def _round(value: Decimal, digits: Decimal = Decimal(0)) -> Decimal:
+    if digits != digits.to_integral_value():
+        raise ValueError("round 的小数位数必须是整数")
+    # quantize 的结果超过上下文精度时 Decimal 只会报 InvalidOperation，这里给出明确的错误
+    if value and value.adjusted() + 1 + int(digits) > getcontext().prec:
+        raise ValueError("结果位数过多，请减少保留的小数位数")
+    # 金额计算习惯四舍五入，而不是 Decimal 默认的银行家舍入
+    return value.quantize(Decimal(1).scaleb(-int(digits)), rounding=ROUND_HALF_UP)
+
+
+def _expand_percent(expression: str) -> str:
+    """把后缀百分号改写为除以 100，如 "20%" -> "(20/100)"，"(10+5)%" -> "((10+5)/100)"。"""
+    output = ""
+    position = 0
+    for match in _POSTFIX_PERCENT_PATTERN.finditer(expression):
+        output += expression[position:match.start()].rstrip()
+        position = match.end()
+        start = _percent_operand_start(output)
+        if start is None:
+            output += "%"
+            continue
+        output = f"{output[:start]}({output[start:]}/100)"
+    return output + expression[position:]
+
+
+def _percent_operand_start(text: str) -> Optional[int]:
+    """返回百分号前操作数（数字或括号表达式）的起始位置。"""
+    if text.endswith(")"):
+        depth = 0
+        for index in range(len(text) - 1, -1, -1):
+            if text[index] == ")":
+                depth += 1
+            elif text[index] == "(":
+                depth -= 1
+                if depth == 0:
+                    return index
+        return None
+    match = _NUMBER_SUFFIX_PATTERN.search(text)
+    return match.start() if match else None
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: _floordiv,
+    ast.Mod: _mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+_FUNCTIONS = {
+    "sqrt": lambda value: value.sqrt(),
+    "round": _round,
+    "abs": abs,
+}
+
 
 class CalculatorInput(BaseModel):
-    """定义计算器输入的模型，包括数学表达式字符串。"""
-    expression: str = Field(
+    """定义计算器输入的模型，包括单个数学表达式或一组表达式。"""
+    expression: Optional[str] = Field(
+        default=None,
         description="数学表达式字符串，如 '15 + 23' 或 '100 * 0.8'",
         examples=["15 + 23", "100 * 0.8", "(50 - 5) / 9"]
     )
+    expressions: Optional[List[str]] = Field(
+        default=None,
+        description="需要一次性计算的多个数学表达式，多步计算时优先使用",
+        examples=[["3000 * 30%", "sqrt(144)", "round(1000 / 3, 2)"]]
+    )
+
+
+@lru_cache(maxsize=256)
+def _compile_expression(expression: str) -> ast.expr:
+    """解析表达式并校验语法节点，结果按表达式字符串缓存。"""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"表达式过长，最多 {MAX_EXPRESSION_LENGTH} 个字符")
+    expression = _expand_percent(expression)
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError:
+        raise ValueError("无效的数学表达式")
+
+    nodes = list(ast.walk(tree.body))
+    if len(nodes) > MAX_NODES:
+        raise ValueError(f"表达式过于复杂，最多 {MAX_NODES} 个运算单元")
+    for node in nodes:
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError("表达式中只能包含数字")
+        elif isinstance(node, ast.BinOp):
+            if type(node.op) not in _BINARY_OPERATORS:
+                raise ValueError("不支持的运算符")
+        elif isinstance(node, ast.UnaryOp):
+            if type(node.op) not in _UNARY_OPERATORS:
+                raise ValueError("不支持的运算符")
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+                raise ValueError(f"不支持的函数，可用函数：{', '.join(_FUNCTIONS)}")
+        elif isinstance(node, ast.Name):
+            if node.id not in _FUNCTIONS:
+                raise ValueError(f"未知的名称：{node.id}")
+        elif not isinstance(node, (ast.operator, ast.unaryop, ast.Load)):
+            raise ValueError("无效的数学表达式")
+    return tree.body
+
 
 class CalculatorTool(BaseTool):
     name: str = "calculator"
     description: str = """
-    用于执行基本数学计算的工具。
-    输入: 数学表达式字符串，如 "15 + 23" 或 "100 * 0.8"
+    用于执行数学计算的工具。
+    输入: 数学表达式字符串 expression，如 "15 + 23" 或 "100 * 0.8"；
+          或表达式列表 expressions，一次调用完成多步计算，如 ["3000 * 30%", "3000 - 900"]
     输出: 计算结果
-    支持: 加法(+)、减法(-)、乘法(*)、除法(/)、括号()
-    """    
+    支持: 加法(+)、减法(-)、乘法(*)、除法(/)、整除(//)、取模(%)、幂(**)、括号()、
+          百分数(如 20%、(10 + 5)%，对负数取模请写成 10 % (-3))、函数 sqrt(x)、round(x, n)（四舍五入）、abs(x)
+    """
     args_schema: Type[BaseModel] = CalculatorInput
-    
-    def _run(self, expression: str, run_manager: Optional[Any] = None) -> str:
+
+    def _run(self, expression: Optional[str] = None, expressions: Optional[List[str]] = None,
+             run_manager: Optional[Any] = None) -> str:
+        if expressions:
+            if len(expressions) > MAX_BATCH_SIZE:
+                return f"计算错误：一次最多计算 {MAX_BATCH_SIZE} 个表达式。"
+            lines = [f"{index}. {item} = {self._calculate_one(item)}" for index, item in enumerate(expressions, 1)]
+            return "计算结果：\n" + "\n".join(lines)
+        if not expression:
+            return "无效的数学表达式。请确保输入正确。"
+        return f"计算结果：{self._calculate_one(expression)}"
+
+    async def _arun(self, expression: Optional[str] = None, expressions: Optional[List[str]] = None,
+                    run_manager: Optional[Any] = None) -> str:
+        return self._run(expression, expressions, run_manager=run_manager)
+
+    def _calculate_one(self, expression: str) -> str:
+        """计算单个表达式，出错时返回错误描述而不是抛出异常，避免影响批量中的其他表达式。"""
         try:
-            if not self._is_valid_expression(expression):
-                return "无效的数学表达式。请确保输入正确。"
             result = self._safe_calculate(expression)
-            return f"计算结果：{result}"
-        except ZeroDivisionError as e:
-            return f"计算错误：除数不能为零。"
+            return self._format_result(result)
+        except ZeroDivisionError:
+            return "计算错误：除数不能为零。"
+        except Overflow:
+            return "计算错误：结果数值过大。"
+        except (Underflow, Subnormal):
+            return "计算错误：结果数值过小。"
+        except InvalidOperation:
+            return "计算错误：无效的运算。"
         except Exception as e:
             return f"计算错误：{str(e)}"
-        
-    async def _arun(self, expression: str, run_manager: Optional[Any] = None) -> str:
-        return self._run(expression, run_manager=run_manager)
-    
-    def _is_valid_expression(self, expression: str) -> bool:
-        """检查表达式是否包含无效字符。"""
-        allowed_chars = re.compile(r'^[0-9+\-*/().\s]+$')
-        return bool(allowed_chars.match(expression))
-    
-    def _safe_calculate(self, expression: str) -> float:
-        """安全计算表达式"""
-        expression = expression.replace(' ', '')
-        
-        # 使用ast.literal_eval
-        try:
-            result = eval(expression, {"__builtins__": {}})
+
+    def _safe_calculate(self, expression: str) -> Decimal:
+        """基于 AST 安全计算表达式，使用 Decimal 保证精度"""
+        tree = _compile_expression(expression)
+        deadline = time.perf_counter() + TIME_BUDGET
+        with localcontext(DECIMAL_CONTEXT):
+            result = self._evaluate(tree, deadline)
+            if not result.is_finite():
+                raise Overflow
             return result
-        except:
-            raise ValueError("无效的数学表达式")
 
-calculator_tool = CalculatorTool()
+    def _evaluate(self, node: ast.expr, deadline: float) -> Decimal:
+        if time.perf_counter() > deadline:
+            raise ValueError("计算超时")
+        if isinstance(node, ast.Constant):
+            # 通过字符串构造，避免 0.1 这类浮点数的二进制误差；经由上下文创建以受精度和数量级限制
+            value = DECIMAL_CONTEXT.create_decimal(str(node.value))
+            if not value.is_finite():
+                raise Overflow
+            return value
+        if isinstance(node, ast.UnaryOp):
+            return _UNARY_OPERATORS[type(node.op)](self._evaluate(node.operand, deadline))
+        if isinstance(node, ast.BinOp):
+            left = self._evaluate(node.left, deadline)
+            right = self._evaluate(node.right, deadline)
+            if isinstance(node.op, ast.Pow) and abs(right) > MAX_EXPONENT:
+                raise ValueError(f"指数过大，绝对值不能超过 {MAX_EXPONENT}")
+            # Decimal 对 0 取模、0/0 报 InvalidOperation，统一按除零处理
+            if isinstance(node.op, (ast.Div, ast.FloorDiv, ast.Mod)) and not right:
+                raise ZeroDivisionError
+            return _BINARY_OPERATORS[type(node.op)](left, right)
+        if isinstance(node, ast.Call):
+            args = [self._evaluate(arg, deadline) for arg in node.args]
+            try:
+                return _FUNCTIONS[node.func.id](*args)
+            except TypeError:
+                raise ValueError(f"函数 {node.func.id} 的参数数量不正确")
+        raise ValueError("无效的数学表达式")
 
+    def _format_result(self, result: Decimal) -> str:
+        result = result.normalize(DISPLAY_CONTEXT)
+        low, high = DISPLAY_FIXED_RANGE
+        if result and not low <= result.adjusted() <= high:
+            return str(result)
+        text = format(result, 'f')
+        return "0" if text == "-0" else text
+
+calculator_tool = CalculatorTool()
@@ -42,14 +42,14 @@ class AddReminderTool(BaseTool):
         self._db = SQLDatabase.from_uri("sqlite:///./data.db")
 
     def _run(self, **kwargs):
-        logger.info(f"当前时间：{datetime.now()}")
+        logger.debug(f"当前时间：{datetime.now()}")
         input = self.args_schema(**kwargs)
         query = f"""
 INSERT INTO reminders (title, description, due_date, priority, status, created_at, updated_at) VALUES(
     '{input.title}', '{input.description}', '{input.due_date}', '{input.priority}', 'pending', '{input.created_at}', '{input.updated_at}'
 )
 """
-        logger.info(f"添加：{query}")
+        logger.debug(f"添加：{query}")
         self._db.run(query)
         return f"Reminder '{input.title}' added successfully."
     
@@ -83,7 +83,7 @@ class QueryReminderTool(BaseTool):
             query += f" AND title LIKE '%{input.title}%'"
         if input.priority:
             query += f" AND priority = '{input.priority}'"
-        logger.info(f"查询：{query}")
+        logger.debug(f"查询：{query}")
 
         return self._db.run(query)
     
@@ -120,7 +120,7 @@ class UpdateReminderTool(BaseTool):
         query += f" updated_at = '{input.updated_at}',"
         query = query.rstrip(",")  # 去掉最后一个逗号
         query += f" WHERE id = {input.id}"
-        logger.info(f"更新：{query}")
+        logger.debug(f"更新：{query}")
         self._db.run(query)
         return f"Reminder '{input.title}' updated successfully."
     